@@ -1,5 +1,7 @@
 from __future__ import absolute_import
 
+import sys as _sys
+
 from FlowCytometryTools._version import version as __version__
 from FlowCytometryTools._doc import __doc__
 
@@ -8,8 +10,17 @@ from fcsparser.api import parse as parse_fcs
 from FlowCytometryTools.core.containers import (FCMeasurement, FCCollection, FCOrderedCollection,
                                                 FCPlate)
 from FlowCytometryTools.core.gates import ThresholdGate, IntervalGate, QuadGate, PolyGate
-import FlowCytometryTools.core.graph as graph
-from FlowCytometryTools.core.graph import plotFCM
+
+if _sys.version_info >= (3, 7):
+    # Delay importing the plotting code (and matplotlib) until it is first used.
+    def __getattr__(name):
+        if name in ('graph', 'plotFCM'):
+            from FlowCytometryTools.core import graph as _graph
+            return _graph if name == 'graph' else _graph.plotFCM
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+else:
+    import FlowCytometryTools.core.graph as graph
+    from FlowCytometryTools.core.graph import plotFCM
 
 
 def _get_paths():
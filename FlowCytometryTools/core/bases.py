@@ -16,14 +16,13 @@ import inspect
 import os
 
 import decorator
-import pylab as pl
 import six
 from numpy import nan, unravel_index
 from pandas import DataFrame as DF
 
-from FlowCytometryTools.core import graph
 from FlowCytometryTools.core.common_doc import doc_replacer
-from FlowCytometryTools.core.utils import get_tag_value, get_files, save, load, to_list
+from FlowCytometryTools.core.utils import (get_tag_value, get_files, save, load, to_list,
+                                           thread_map)
 
 
 @doc_replacer
@@ -49,7 +48,7 @@ def _assign_IDS_to_datafiles(datafiles, parser, measurement_class=None, **kwargs
     -------
     Dict of ID:datafile
     """
-    if isinstance(parser, collections.Mapping):
+    if isinstance(parser, Mapping):
         fparse = lambda x: parser[x]
     elif hasattr(parser, '__call__'):
         fparse = lambda x: parser(x, **kwargs)
@@ -96,6 +95,11 @@ def int2letters(x, alphabet):
 
 _now = 'apply_now'
 
+try:
+    _getargspec = inspect.getfullargspec
+except AttributeError:  # Python 2
+    _getargspec = inspect.getargspec
+
 
 @decorator.decorator
 def queueable(fun, *args, **kwargs):
@@ -103,7 +107,8 @@ def queueable(fun, *args, **kwargs):
     if not _now in params:
         raise ValueError('"%s" must be a parameter of queued function "%s"' % (_now, fun.__name__))
     f_name = fun.__name__
-    kw_name = inspect.getargspec(fun).keywords
+    spec = _getargspec(fun)
+    kw_name = spec.varkw if hasattr(spec, 'varkw') else spec.keywords
     kws = params.pop(kw_name, {})
     params.update(kws)
     if params[_now]:
@@ -184,6 +189,14 @@ class Measurement(BaseObject):
         self.history = []
         self.queue = []
 
+    def _copy_without_data(self):
+        '''
+        Make a deep copy of this measurement, except for the data (which is not copied).
+        Useful when the data of the copy is about to be replaced anyway.
+        '''
+        from copy import deepcopy
+        return deepcopy(self, {id(self._data): None})
+
     def _set_position(self, orderedcollection_id, pos):
         self.position[orderedcollection_id] = pos
 
@@ -363,10 +376,13 @@ class Measurement(BaseObject):
 
 Well = Measurement
 
-import collections
+try:
+    from collections.abc import Mapping, MutableMapping
+except ImportError:  # Python 2
+    from collections import Mapping, MutableMapping
 
 
-class MeasurementCollection(collections.MutableMapping, BaseObject):
+class MeasurementCollection(MutableMapping, BaseObject):
     '''
     A collection of measurements
     '''
@@ -388,7 +404,7 @@ class MeasurementCollection(collections.MutableMapping, BaseObject):
         '''
         self.ID = ID
         self.data = {}
-        if isinstance(measurements, collections.Mapping):
+        if isinstance(measurements, Mapping):
             self.update(measurements)
         else:
             for m in measurements:
@@ -473,8 +489,9 @@ class MeasurementCollection(collections.MutableMapping, BaseObject):
     # ----------------------
     # User methods
     # ----------------------
+    @doc_replacer
     def apply(self, func, ids=None, applyto='measurement', noneval=nan,
-              setdata=False, output_format='dict', ID=None,
+              setdata=False, output_format='dict', ID=None, n_jobs=1,
               **kwargs):
         '''
         Apply func to each of the specified measurements.
@@ -498,16 +515,19 @@ class MeasurementCollection(collections.MutableMapping, BaseObject):
             * collection : keeps result as collection
             WARNING: For collection, func should return a copy of the measurement instance rather
             than the original measurement instance.
+        {_n_jobs_par}
         Returns
         -------
         Dictionary keyed by measurement keys containing the corresponding output of func
         or returns a collection (if output_format='collection').
         '''
         if ids is None:
-            ids = self.keys()
+            ids = list(self.keys())
         else:
             ids = to_list(ids)
-        result = dict((i, self[i].apply(func, applyto, noneval, setdata)) for i in ids)
+        outputs = thread_map(lambda i: self[i].apply(func, applyto, noneval, setdata), ids,
+                             n_jobs=n_jobs)
+        result = dict(zip(ids, outputs))
 
         if output_format == 'collection':
             can_keep_as_collection = all(
@@ -622,7 +642,7 @@ class MeasurementCollection(collections.MutableMapping, BaseObject):
         """
         fil = criteria
         new = self.copy()
-        if isinstance(applyto, collections.Mapping):
+        if isinstance(applyto, Mapping):
             remove = (k for k, v in self.items() if not fil(applyto[k]))
         elif applyto == 'measurement':
             remove = (k for k, v in self.items() if not fil(v))
@@ -864,7 +884,7 @@ class OrderedCollection(MeasurementCollection):
 
         if hasattr(position_mapper, '__call__'):
             mapper = position_mapper
-        elif isinstance(position_mapper, collections.Mapping):
+        elif isinstance(position_mapper, Mapping):
             mapper = lambda x: position_mapper[x]
         elif position_mapper == 'name':
             mapper = lambda x: (x[0], int(x[1:]))
@@ -961,9 +981,10 @@ class OrderedCollection(MeasurementCollection):
     def shape(self):
         return (len(self.row_labels), len(self.col_labels))
 
+    @doc_replacer
     def apply(self, func, ids=None, applyto='measurement',
               output_format='DataFrame', noneval=nan,
-              setdata=False, dropna=False, ID=None):
+              setdata=False, dropna=False, ID=None, n_jobs=1):
         """
         Apply func to each of the specified measurements.
 
@@ -989,6 +1010,7 @@ class OrderedCollection(MeasurementCollection):
             ID is used as the new ID for the collection.
             If None, then the old ID is retained.
             Note: Only applicable when output is a collection.
+        {_n_jobs_par}
 
         Returns
         -------
@@ -997,7 +1019,7 @@ class OrderedCollection(MeasurementCollection):
         _output = 'collection' if output_format == 'collection' else 'dict'
         result = super(OrderedCollection, self).apply(func, ids, applyto,
                                                       noneval, setdata,
-                                                      output_format=_output)
+                                                      output_format=_output, n_jobs=n_jobs)
 
         # Note: result should be of type dict or collection for the code
         # below to work
@@ -1060,6 +1082,10 @@ class OrderedCollection(MeasurementCollection):
         [callArgs.pop(varname) for varname in
          ['self', 'func', 'applyto', 'ids', 'colorbar', 'xlim', 'ylim']]  # pop args
 
+        # Imported here so that matplotlib is only loaded when plotting
+        import pylab as pl
+        from FlowCytometryTools.core import graph
+
         callArgs['rowNum'] = self.shape[0]
         callArgs['colNum'] = self.shape[1]
 
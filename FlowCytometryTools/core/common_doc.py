@@ -192,6 +192,11 @@ bins : int | ndarray | [ndarray]
     according to minimum and maximum values of data from across all the
     FCMeasurements. If this is confusing for you, just specify the
     bin locations explicitely.
+
+    If the optional fast-histogram package is installed, histograms of non-integer
+    data with uniformly spaced bins are computed using it, which is much faster for
+    large samples. Events lying exactly on an interior bin edge may then be counted
+    in the neighbouring bin.
     """,
 
 common_plot_ax="""\
@@ -218,6 +223,11 @@ ylim : 2-tuple
     min and max y value for each subplot
     if None, the limits are automatically determined for each subplot""",
 
+_n_jobs_par="""\
+n_jobs : int
+    Number of threads used to process the measurements.
+    1 (default) processes them one after the other, -1 uses as many threads as there are processors.""",
+
 _containers_held_in_memory_warning="""\
 .. warning::
     The new Collection will hold the data for **ALL** Measurements in memory!
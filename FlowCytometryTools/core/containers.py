@@ -1,23 +1,60 @@
 from __future__ import absolute_import
 
-import collections
-import inspect
 import warnings
-from itertools import cycle
-from random import sample
+from itertools import cycle, repeat
 
-import matplotlib
 import numpy as np
 from fcsparser import parse as parse_fcs
-from pandas import DataFrame
+from pandas import DataFrame, Series
 
-import FlowCytometryTools.core.graph as graph
 from FlowCytometryTools.core.bases import (Measurement, MeasurementCollection, OrderedCollection,
-                                           queueable)
+                                           queueable, _getargspec)
 from FlowCytometryTools.core.common_doc import doc_replacer
-from FlowCytometryTools.core.graph import plot_ndpanel
 from FlowCytometryTools.core.transforms import Transformation
-from FlowCytometryTools.core.utils import to_list
+from FlowCytometryTools.core.utils import to_list, thread_map
+
+try:
+    from collections.abc import Iterable
+except ImportError:  # Python 2
+    from collections import Iterable
+
+# Key word arguments that FCOrderedCollection.plot forwards to grid_plot
+_GRID_PLOT_ARGS = frozenset(_getargspec(OrderedCollection.grid_plot).args)
+
+
+def _get_channel_ranges(channel_meta, channel_names, channels):
+    """ Returns the data ranges ($PnR) of the given channels (in the order of the metadata). """
+    # the -1 below because the channel numbers begin from 1 instead of 0
+    # (this is fragile code)
+    names = [channel_names[i - 1] for i in channel_meta.index]
+    ranges = Series(channel_meta['$PnR'].values.astype(float), index=names)
+    return ranges[ranges.index.isin(channels)].values
+
+
+def _raw_values(data, channels):
+    """
+    Returns the values of the given channels of a DataFrame as a 2D ndarray (events x channels).
+
+    The channels are selected by position, so only the requested columns are copied
+    (never the whole frame).
+    """
+    channels = list(channels)
+    positions = data.columns.get_indexer(channels)
+    if (positions < 0).any():
+        missing = [c for c, p in zip(channels, positions) if p < 0]
+        raise KeyError('Channels not found in data: {}'.format(missing))
+    return data.iloc[:, positions].to_numpy()
+
+
+def _random_positions(num_events, num_samples):
+    """ Returns num_samples distinct positions drawn at random from range(num_events). """
+    if hasattr(np.random, 'default_rng'):
+        # Generator.choice doesn't shuffle all the events to draw a few of them.
+        # Seeded from the global state, so that np.random.seed still makes this reproducible.
+        rng = np.random.default_rng(np.random.randint(2 ** 31))
+        return rng.choice(num_events, num_samples, replace=False)
+    else:  # numpy < 1.17
+        return np.random.choice(num_events, num_samples, replace=False)
 
 
 class FCMeasurement(Measurement):
@@ -38,7 +75,7 @@ class FCMeasurement(Measurement):
         if self.meta is not None:
             return self.meta['_channel_names_']
 
-    def read_data(self, **kwargs):
+    def read_data(self, dtype=np.float32, lazy=False, **kwargs):
         '''
         Read the datafile specified in Sample.datafile and
         return the resulting object.
@@ -46,10 +83,66 @@ class FCMeasurement(Measurement):
 
         It's advised not to use this method, but instead to access
         the data through the FCMeasurement.data attribute.
+
+        Parameters
+        ----------
+        dtype : numpy dtype | None
+            Floating point data is stored with this dtype (single precision by default,
+            which exceeds the resolution of the detectors).
+            Integer data is kept as is.
+            If None, the data is kept as returned by the parser.
+            Can be set through readdata_kwargs, e.g. readdata_kwargs={'dtype': None}.
+            Not applied to memory mapped data.
+        lazy : bool
+            If True, the DATA segment of the file is memory mapped instead of read.
+            Events are then only read from disk when they are accessed, and are not
+            held in memory by the measurement (modifications are kept in memory, the file
+            is never written to).
+            Only supported for list mode data stored in the native byte order with the same
+            number of bits for all channels (and, for integer data, using all of these bits);
+            other files are read normally.
+            Can be set through readdata_kwargs, e.g. readdata_kwargs={'lazy': True}.
+        kwargs :
+            Passed on to the fcs parser.
         '''
+        if lazy:
+            data = self._memmap_data()
+            if data is not None:
+                return data
         meta, data = parse_fcs(self.datafile, **kwargs)
+        if (dtype is not None and all(t.kind == 'f' for t in data.dtypes) and
+                any(t != dtype for t in data.dtypes)):
+            data = data.astype(dtype)
         return data
 
+    def _memmap_data(self):
+        '''
+        Memory map the DATA segment of the datafile as a DataFrame (events x channels).
+        Returns None if the layout of the DATA segment does not allow it.
+        '''
+        meta = self.get_meta()
+        endian = {'1,2,3,4': '<', '1,2': '<',
+                  '4,3,2,1': '>', '2,1': '>'}.get(meta['$BYTEORD'].strip())
+        kind = {'F': 'f', 'D': 'f', 'I': 'u'}.get(meta['$DATATYPE'])
+        bits = set(self.channels['$PnB'].astype(int))
+        if meta.get('$MODE', 'L') != 'L' or endian is None or kind is None or len(bits) != 1:
+            return None
+        bits = bits.pop()
+        if bits % 8:
+            return None
+        if kind == 'u' and (self.channels['$PnR'].astype(float) < 2 ** bits).any():
+            # Integer values must be masked down to their range ($PnR), which the parser does
+            return None
+        data_dtype = np.dtype('{}{}{}'.format(endian, kind, bits // 8))
+        if not data_dtype.isnative:
+            return None
+        # The header holds 0 if the offset does not fit in it
+        start = meta['__header__']['data start'] or int(meta['$BEGINDATA'])
+        shape = (int(meta['$TOT']), int(meta['$PAR']))
+        # copy-on-write: changes to the data are never written to the file
+        values = np.memmap(self.datafile, dtype=data_dtype, mode='c', offset=start, shape=shape)
+        return DataFrame(values, columns=list(self.channel_names), copy=False)
+
     def read_meta(self, **kwargs):
         '''
         Read only the annotation of the FCS file (without reading DATA segment).
@@ -91,7 +184,7 @@ class FCMeasurement(Measurement):
 
     @doc_replacer
     def plot(self, channel_names, kind='histogram',
-             gates=None, gate_colors=None, gate_lw=1, **kwargs):
+             gates=None, gate_colors=None, gate_lw=1, downsample=False, **kwargs):
         """Plot the flow cytometry data associated with the sample on the current axis.
 
         To produce the plot, follow up with a call to matplotlib's show() function.
@@ -107,6 +200,15 @@ class FCMeasurement(Measurement):
             line width to use when drawing gates
             if float, uses the same line width for all gates
             if iterable, then cycles between the values
+        gate_colors: None | color | iterable
+            colors to use when drawing gates
+            if a single color (e.g., 'r' or an RGB tuple), uses it for all gates
+            if iterable of colors, then cycles between the values
+        downsample : [False | 'auto']
+            Only applies to scatter plots.
+            If 'auto', and there are many more events than pixels along the x axis,
+            only the events that determine how each pixel column looks are plotted
+            (the events with the min and max y values, and the first and last events).
         kwargs : dict
             Additional keyword arguments to be passed to graph.plotFCM
 
@@ -120,21 +222,38 @@ class FCMeasurement(Measurement):
         >>> sample.plot('Y2-A', bins=100, alpha=0.7, color='green', normed=1) # 1d histogram
         >>> sample.plot(['B1-A', 'Y2-A'], cmap=cm.Oranges, colorbar=False) # 2d histogram
         """
+        # Imported here so that matplotlib is only loaded when plotting
+        from FlowCytometryTools.core import graph
+
         ax = kwargs.get('ax')
 
         channel_names = to_list(channel_names)
         gates = to_list(gates)
 
-        plot_output = graph.plotFCM(self.data, channel_names, kind=kind, **kwargs)
+        data = self.data
+        if downsample and kind == 'scatter' and len(channel_names) == 2:
+            plot_ax = graph.pl.gca() if ax is None else ax
+            width = max(int(np.ceil(plot_ax.get_window_extent().width)), 1)  # in pixels
+            if len(data) > 4 * width:
+                x, y = data[channel_names[0]].values, data[channel_names[1]].values
+                data = data.iloc[graph._m4_indexes(x, y, width)]
+
+        plot_output = graph.plotFCM(data, channel_names, kind=kind, **kwargs)
 
         if gates is not None:
+            from matplotlib.colors import is_color_like
+
             if gate_colors is None:
                 gate_colors = cycle(('b', 'g', 'r', 'm', 'c', 'y'))
+            elif is_color_like(gate_colors):
+                gate_colors = repeat(gate_colors)  # a single color for all gates
+            else:
+                gate_colors = cycle(gate_colors)
 
-            if not isinstance(gate_lw, collections.Iterable):
-                gate_lw = [gate_lw]
-
-            gate_lw = cycle(gate_lw)
+            if isinstance(gate_lw, Iterable):
+                gate_lw = cycle(gate_lw)
+            else:
+                gate_lw = repeat(gate_lw)
 
             for (g, c, lw) in zip(gates, gate_colors, gate_lw):
                 g.plot(ax=ax, ax_channels=channel_names, color=c, lw=lw)
@@ -163,10 +282,17 @@ class FCMeasurement(Measurement):
 
         axes references
         """
+        from FlowCytometryTools.core.graph import plot_ndpanel
+
         if channel_names == 'auto':
             channel_names = list(self.channel_names)
 
-        def plot_region(channels, **kwargs):
+        channel_list = np.array(list(channel_names), dtype=object)
+        # The subplot at (row, col) shows channels (x_names[row, col], y_names[row, col])
+        x_names, y_names = np.meshgrid(channel_list, channel_list, indexing='xy')
+
+        def plot_region(cell, **kwargs):
+            channels = [x_names.flat[cell], y_names.flat[cell]]
             if channels[0] == channels[1]:
                 channels = channels[0]
             kind = 'histogram'
@@ -174,9 +300,9 @@ class FCMeasurement(Measurement):
             self.plot(channels, kind=kind, gates=gates,
                       gate_colors=gate_colors, autolabel=False)
 
-        channel_list = np.array(list(channel_names), dtype=object)
-        channel_mat = [[(x, y) for x in channel_list] for y in channel_list]
-        channel_mat = DataFrame(channel_mat, columns=channel_list, index=channel_list)
+        # Each entry holds the flat index of its cell in x_names / y_names
+        cells = np.arange(x_names.size).reshape(x_names.shape)
+        channel_mat = DataFrame(cells, columns=channel_list, index=channel_list)
         kwargs.setdefault('wspace', 0.1)
         kwargs.setdefault('hspace', 0.1)
         return plot_ndpanel(channel_mat, plot_region, **kwargs)
@@ -189,6 +315,8 @@ class FCMeasurement(Measurement):
         backend: 'auto' | 'wx' | 'webagg'
             Specifies which backend should be used to view the sample.
         '''
+        import matplotlib
+
         if backend == 'auto':
             if matplotlib.__version__ >= '1.4.3':
                 backend = 'WebAgg'
@@ -236,9 +364,7 @@ class FCMeasurement(Measurement):
         --------
         {FCMeasurement_transform_examples}
         """
-        # Create new measurement
-        new = self.copy()
-        data = new.data
+        data = self.get_data()
 
         channels = to_list(channels)
         if channels is None:
@@ -253,12 +379,8 @@ class FCMeasurement(Measurement):
                         'Encountered both auto_range=True and user-specified range value in '
                         'parameter d.\n Range value specified in parameter d is used.')
                 else:
-                    channel_meta = self.channels
-                    # the -1 below because the channel numbers begin from 1 instead of 0
-                    # (this is fragile code)
-                    ranges = [float(r['$PnR']) for i, r in channel_meta.iterrows() if
-                              self.channel_names[i - 1] in channels]
-                    if not np.allclose(ranges, ranges[0]):
+                    ranges = _get_channel_ranges(self.channels, self.channel_names, channels)
+                    if np.ptp(ranges) > 1e-5 * abs(ranges[0]):
                         raise Exception("""Not all specified channels have the same data range,
                             therefore they cannot be transformed together.\n
                             HINT: Try transforming one channel at a time.
@@ -270,13 +392,15 @@ class FCMeasurement(Measurement):
                         kwargs['d'] = np.log10(ranges[0])
             transformer = Transformation(transform, direction, args, **kwargs)
         ## create new data
-        transformed = transformer(data[channels], use_spln)
+        transformed = transformer(_raw_values(data, channels), use_spln)
         if return_all:
-            new_data = data
+            new_data = data.copy()
+            new_data[channels] = transformed
         else:
-            new_data = data.filter(channels)
-        new_data[channels] = transformed
-        ## update new Measurement
+            # Only the transformed channels are allocated
+            new_data = DataFrame(transformed, index=data.index, columns=channels)
+        ## create new Measurement (without copying the original data)
+        new = self._copy_without_data()
         new.data = new_data
 
         if ID is not None:
@@ -331,7 +455,7 @@ class FCMeasurement(Measurement):
                     # EDGE CAES: Must return an empty sample
                     order = 'start'
                 if order == 'random':
-                    newdata = data.loc[sample(list(data.index), key)]  # Use loc not iloc here!!
+                    newdata = data.iloc[_random_positions(num_events, key)]
                 elif order == 'start':
                     newdata = data.iloc[:key]
                 elif order == 'end':
@@ -344,7 +468,7 @@ class FCMeasurement(Measurement):
             print("If you're encountering an out-of-bounds error, "
                   "try to setting 'auto_resize' to True.")
             raise
-        newsample = self.copy()
+        newsample = self._copy_without_data()
         newsample.set_data(data=newdata)
         return newsample
 
@@ -366,13 +490,19 @@ class FCMeasurement(Measurement):
         '''
         data = self.get_data()
         newdata = gate(data)
-        newsample = self.copy()
+        newsample = self._copy_without_data()
         newsample.data = newdata
         return newsample
 
     @property
     def counts(self):
         """ Returns total number of events. """
+        if self._data is None and not self.queue and self.datafile is not None:
+            # The number of events is recorded in the TEXT segment,
+            # no need to parse the DATA segment.
+            total = self.get_meta().get('$TOT')
+            if total is not None:
+                return int(total)
         data = self.get_data()
         return data.shape[0]
 
@@ -387,7 +517,7 @@ class FCCollection(MeasurementCollection):
     def transform(self, transform, direction='forward', share_transform=True,
                   channels=None, return_all=True, auto_range=True,
                   use_spln=True, get_transformer=False, ID=None,
-                  apply_now=True,
+                  apply_now=True, n_jobs=1,
                   args=(), **kwargs):
         '''
         Apply transform to each Measurement in the Collection.
@@ -401,6 +531,7 @@ class FCCollection(MeasurementCollection):
         {FCMeasurement_transform_pars}
         ID : hashable | None
             ID for the resulting collection. If None is passed, the original ID is used.
+        {_n_jobs_par}
 
         Returns
         -------
@@ -417,8 +548,11 @@ class FCCollection(MeasurementCollection):
         new = self.copy()
         if share_transform:
 
-            channel_meta = list(self.values())[0].channels
-            channel_names = list(self.values())[0].channel_names
+            first = next(iter(self.values()), None)
+            if first is None:
+                raise ValueError('Cannot transform an empty collection.')
+            channel_meta = first.channels
+            channel_names = first.channel_names
             if channels is None:
                 channels = list(channel_names)
             else:
@@ -433,11 +567,8 @@ class FCCollection(MeasurementCollection):
                                       'value in parameter d.\n '
                                       'Range value specified in parameter d is used.')
                     else:
-                        # the -1 below because the channel numbers begin from 1 instead of 0 (this is fragile code)
-                        ranges = [float(r['$PnR']) for i, r in channel_meta.iterrows() if
-                                  channel_names[i - 1] in channels]
-
-                        if not np.allclose(ranges, ranges[0]):
+                        ranges = _get_channel_ranges(channel_meta, channel_names, channels)
+                        if np.ptp(ranges) > 1e-5 * abs(ranges[0]):
                             raise Exception('Not all specified channels have the same '
                                             'data range, therefore they cannot be '
                                             'transformed together.')
@@ -447,20 +578,38 @@ class FCCollection(MeasurementCollection):
                             # for hlog / tlog transformations
                             kwargs['d'] = np.log10(ranges[0])
                 transformer = Transformation(transform, direction, args, **kwargs)
-                if use_spln:
-                    xmax = self.apply(lambda x: x[channels].max().max(), applyto='data').max().max()
-                    xmin = self.apply(lambda x: x[channels].min().min(), applyto='data').min().min()
-                    transformer.set_spline(xmin, xmax)
+            if use_spln and transformer.spln is None:
+                # Build the spline once, over the data range of the whole collection
+                # (a single pass over the data of each measurement).
+                def data_limits(data):
+                    values = _raw_values(data, channels)
+                    if values.size:
+                        return np.nanmin(values), np.nanmax(values)
+
+                limits = self.apply(data_limits, applyto='data', output_format='dict')
+                limits = [l for l in limits.values() if isinstance(l, tuple)]
+                xmin = min(l[0] for l in limits)
+                xmax = max(l[1] for l in limits)
+                transformer.set_spline(xmin, xmax)
             ## transform all measurements
-            for k, v in new.items():
-                new[k] = v.transform(transformer, channels=channels, return_all=return_all,
-                                     use_spln=use_spln, apply_now=apply_now)
+            # The transformer is fully specified, so the range lookup is skipped for each measurement
+            def func(v):
+                return v.transform(transformer, channels=channels, return_all=return_all,
+                                   auto_range=False, use_spln=use_spln, apply_now=apply_now)
         else:
-            for k, v in new.items():
-                new[k] = v.transform(transform, direction=direction, channels=channels,
-                                     return_all=return_all, auto_range=auto_range,
-                                     get_transformer=False,
-                                     use_spln=use_spln, apply_now=apply_now, args=args, **kwargs)
+            if use_spln and isinstance(transform, Transformation) and transform.spln is None:
+                # The spline is set on the given Transformation by the first measurement
+                # transformed and then used for the others, so keep the measurements in order.
+                n_jobs = 1
+
+            def func(v):
+                return v.transform(transform, direction=direction, channels=channels,
+                                   return_all=return_all, auto_range=auto_range,
+                                   get_transformer=False,
+                                   use_spln=use_spln, apply_now=apply_now, args=args, **kwargs)
+        keys = list(new.keys())
+        for k, v in zip(keys, thread_map(func, [new[k] for k in keys], n_jobs=n_jobs)):
+            new[k] = v
         if ID is not None:
             new.ID = ID
         if share_transform and get_transformer:
@@ -469,7 +618,7 @@ class FCCollection(MeasurementCollection):
             return new
 
     @doc_replacer
-    def gate(self, gate, ID=None, apply_now=True):
+    def gate(self, gate, ID=None, apply_now=True, n_jobs=1):
         '''
         Applies the gate to each Measurement in the Collection, returning a new Collection with gated data.
 
@@ -481,12 +630,13 @@ class FCCollection(MeasurementCollection):
 
         ID : [ str, numeric, None]
             New ID to be given to the output. If None, the ID of the current collection will be used.
+        {_n_jobs_par}
         '''
 
         def func(well):
             return well.gate(gate, apply_now=apply_now)
 
-        return self.apply(func, output_format='collection', ID=ID)
+        return self.apply(func, output_format='collection', ID=ID, n_jobs=n_jobs)
 
     @doc_replacer
     def subsample(self, key, order='random', auto_resize=False, ID=None):
@@ -513,7 +663,8 @@ class FCCollection(MeasurementCollection):
 
         return self.apply(func, output_format='collection', ID=ID)
 
-    def counts(self, ids=None, setdata=False, output_format='DataFrame'):
+    @doc_replacer
+    def counts(self, ids=None, setdata=False, output_format='DataFrame', n_jobs=1):
         """
         Return the counts in each of the specified measurements.
 
@@ -527,13 +678,15 @@ class FCCollection(MeasurementCollection):
             Used only if data is not already set.
         output_format : DataFrame | dict
             Specifies the output format for that data.
+        {_n_jobs_par}
 
         Returns
         -------
         [DataFrame | Dictionary]
             Dictionary keys correspond to measurement keys.
         """
-        return self.apply(lambda x: x.counts, ids=ids, setdata=setdata, output_format=output_format)
+        return self.apply(lambda x: x.counts, ids=ids, setdata=setdata, output_format=output_format,
+                          n_jobs=n_jobs)
 
 
 class FCOrderedCollection(OrderedCollection, FCCollection):
@@ -588,14 +741,12 @@ class FCOrderedCollection(OrderedCollection, FCCollection):
         # be sent to grid_plot instead of two sample.plot
         # (May not be a robust solution, we'll see as the code evolves
 
-        grid_arg_list = inspect.getargspec(OrderedCollection.grid_plot).args
-
         grid_plot_kwargs = {'ids': ids,
                             'row_labels': row_labels,
                             'col_labels': col_labels}
 
         for key, value in list(kwargs.items()):
-            if key in grid_arg_list:
+            if key in _GRID_PLOT_ARGS:
                 kwargs.pop(key)
                 grid_plot_kwargs[key] = value
 
@@ -611,21 +762,16 @@ class FCOrderedCollection(OrderedCollection, FCCollection):
             nbins = kwargs.get('bins', 200)
 
             if isinstance(nbins, int):
-                min_list = []
-                max_list = []
+                # Running per-channel min/max across all samples (data is read once per sample)
+                min_v = np.full(len(channel_names), np.inf)
+                max_v = np.full(len(channel_names), -np.inf)
                 for sample in self:
-                    min_list.append(self[sample].data[channel_names].min().values)
-                    max_list.append(self[sample].data[channel_names].max().values)
-
-                min_list = list(zip(*min_list))
-                max_list = list(zip(*max_list))
-
-                bins = []
+                    values = _raw_values(self[sample].data, channel_names)
+                    if len(values):
+                        np.minimum(min_v, np.nanmin(values, axis=0), out=min_v)
+                        np.maximum(max_v, np.nanmax(values, axis=0), out=max_v)
 
-                for i, c in enumerate(channel_names):
-                    min_v = min(min_list[i])
-                    max_v = max(max_list[i])
-                    bins.append(np.linspace(min_v, max_v, nbins))
+                bins = [np.linspace(lo, hi, nbins) for lo, hi in zip(min_v, max_v)]
 
                 # Check if 1d
                 if len(channel_names) == 1:
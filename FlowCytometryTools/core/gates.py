@@ -13,8 +13,7 @@ Gates:
     PolyGate
 """
 import numpy
-import pylab as pl
-from matplotlib.path import Path
+from pandas import Series
 
 from FlowCytometryTools.core.common_doc import doc_replacer
 from FlowCytometryTools.core.utils import to_list
@@ -119,7 +118,8 @@ class Gate(_ComposableMixin):
 
         idx = self._identify(dataframe)
 
-        return dataframe[idx]
+        # Index with the raw boolean array (it is aligned with the dataframe by construction)
+        return dataframe[numpy.asarray(idx)]
 
     def _find_orientation(self, ax_channels):
         ax_channels = to_list(ax_channels)
@@ -188,18 +188,21 @@ class ThresholdGate(Gate):
 
     def _identify(self, dataframe):
         """ Identifies which of the data points in the dataframe pass the gate. """
-        idx = dataframe[self.channels[0]] >= self.vert  # Get indexes that are above threshold
+        x = dataframe[self.channels[0]].values
+        idx = x >= self.vert  # Get indexes that are above threshold
 
         if self.region == 'below':
-            idx = ~idx
+            numpy.logical_not(idx, out=idx)
 
-        return idx
+        return Series(idx, index=dataframe.index)
 
     @doc_replacer
     def plot(self, flip=False, ax_channels=None, ax=None, *args, **kwargs):
         """
         {_gate_plot_doc}
         """
+        import pylab as pl
+
         if ax == None:
             ax = pl.gca()
 
@@ -237,19 +240,22 @@ class IntervalGate(Gate):
 
     def _identify(self, dataframe):
         """Return bool series which is True for indexes that 'pass' the gate"""
-        idx = ((dataframe[self.channels[0]] <= self.vert[1]) &
-               (dataframe[self.channels[0]] >= self.vert[0]))
+        x = dataframe[self.channels[0]].values
+        idx = x <= self.vert[1]
+        idx &= x >= self.vert[0]
 
         if self.region == 'out':
-            idx = ~idx
+            numpy.logical_not(idx, out=idx)
 
-        return idx
+        return Series(idx, index=dataframe.index)
 
     @doc_replacer
     def plot(self, flip=False, ax_channels=None, ax=None, *args, **kwargs):
         """
         {_gate_plot_doc}
         """
+        import pylab as pl
+
         if ax == None:
             ax = pl.gca()
 
@@ -296,24 +302,26 @@ class QuadGate(Gate):
         # TODO Fix this implementation. (i.e., why not support just 'left')
         # At the moment this implementation won't work at all.
         # The logic here can be simplified.
-        id1 = dataframe[self.channels[0]] >= self.vert[0]
-        id2 = dataframe[self.channels[1]] >= self.vert[1]
+        id1 = dataframe[self.channels[0]].values >= self.vert[0]
+        id2 = dataframe[self.channels[1]].values >= self.vert[1]
 
-        if 'left' in self.region: id1 = ~id1
-        if 'bottom' in self.region: id2 = ~id2
+        if 'left' in self.region: numpy.logical_not(id1, out=id1)
+        if 'bottom' in self.region: numpy.logical_not(id2, out=id2)
 
-        idx = id1 & id2
+        idx = numpy.logical_and(id1, id2, out=id1)
 
         if 'out' in self.region:
-            idx = ~idx
+            numpy.logical_not(idx, out=idx)
 
-        return idx
+        return Series(idx, index=dataframe.index)
 
     @doc_replacer
     def plot(self, flip=False, ax_channels=None, ax=None, *args, **kwargs):
         """
         {_gate_plot_doc}
         """
+        import pylab as pl
+
         if ax == None:
             ax = pl.gca()
 
@@ -359,6 +367,8 @@ class PolyGate(Gate):
         ----------
         dataframe : DataFrame
         """
+        from matplotlib.path import Path
+
         path = Path(self.vert)
         idx = path.contains_points(dataframe.filter(self.channels))
 
@@ -372,6 +382,8 @@ class PolyGate(Gate):
         """
         {_gate_plot_doc}
         """
+        import pylab as pl
+
         if ax == None:
             ax = pl.gca()
 
@@ -479,7 +491,7 @@ class CompositeGate(_ComposableMixin):
 
     def __call__(self, dataframe):
         idx = self._identify(dataframe)
-        return dataframe[idx]
+        return dataframe[numpy.asarray(idx)]
 
     @doc_replacer
     def plot(self, flip=False, ax_channels=None, ax=None, *args, **kwargs):
@@ -18,6 +18,164 @@ from numpy import arange
 from FlowCytometryTools.core.common_doc import doc_replacer
 from FlowCytometryTools.core.utils import to_list
 
+try:
+    import fast_histogram
+except ImportError:
+    fast_histogram = None
+
+# Largest range of values (max - min) for which integer data is histogrammed using bincount
+_bincount_max_span = 2 ** 20
+
+
+def _uniform_bins(x, bins, range=None):
+    """
+    Describe the binning as (nbins, (lo, hi)) if the bins are uniformly spaced.
+
+    Follows the conventions of numpy.histogram for inferring the range
+    from the data. Returns None if the bins are not uniform or the range
+    cannot be determined (e.g., no finite data).
+    """
+    if isinstance(bins, int):
+        if range is None:
+            if len(x) == 0:
+                return None
+            lo, hi = numpy.nanmin(x), numpy.nanmax(x)
+        else:
+            lo, hi = range
+        nbins = bins
+    else:
+        try:
+            edges = numpy.asarray(bins, dtype=float)
+        except (TypeError, ValueError):  # e.g., bins='auto'
+            return None
+        if edges.ndim != 1 or len(edges) < 2:
+            return None
+        nbins = len(edges) - 1
+        lo, hi = edges[0], edges[-1]
+        if not numpy.allclose(numpy.diff(edges), (hi - lo) / nbins, rtol=1e-6, atol=0):
+            return None
+    if not (numpy.isfinite(lo) and numpy.isfinite(hi)) or lo >= hi or nbins < 1:
+        return None
+    return nbins, (float(lo), float(hi))
+
+
+def _int_hist1d(x, bins, range=None):
+    """
+    Compute a 1d histogram of integer valued data using numpy.bincount.
+
+    The events are counted per integer value in a single pass, and only the (few)
+    distinct values are then binned. Returns (counts, edges) with the same semantics
+    as numpy.histogram, or None if x is not integer valued or spans too large a range.
+    """
+    if x.dtype.kind not in 'iu' or not len(x) or hasattr(bins, 'lower'):
+        return None
+    xmin, xmax = int(x.min()), int(x.max())
+    if xmax - xmin >= _bincount_max_span:
+        return None
+    value_counts = numpy.bincount(x.astype(numpy.intp) - xmin)
+    values = numpy.arange(xmin, xmax + 1)
+    return numpy.histogram(values, bins=bins, range=range, weights=value_counts)
+
+
+def _is_integer_valued(x):
+    """ Whether all the finite values of x are integers. """
+    if x.dtype.kind in 'biu':
+        return True
+    with numpy.errstate(invalid='ignore'):
+        fraction = numpy.mod(x, 1)
+    return bool(numpy.all((fraction == 0) | numpy.isnan(fraction)))
+
+
+def _fast_hist1d(x, bins, range=None):
+    """
+    Compute a 1d histogram using fast_histogram.
+
+    Returns (counts, edges) with the same semantics as numpy.histogram,
+    or None if fast_histogram is unavailable, the bins are not uniform or x is integer valued.
+
+    fast_histogram computes the bin of each event with its own floating point arithmetic,
+    so events lying exactly on an interior bin edge may be counted in the neighbouring bin.
+    This is common for integer valued data (e.g., FCS files storing integers as floats),
+    which is therefore left to numpy.
+    """
+    if fast_histogram is None or _is_integer_valued(x):
+        return None
+    spec = _uniform_bins(x, bins, range)
+    if spec is None:
+        return None
+    nbins, (lo, hi) = spec
+    counts = fast_histogram.histogram1d(x, bins=nbins, range=(lo, hi))
+    # numpy includes the right edge in the last bin; fast_histogram doesn't.
+    counts[-1] += numpy.count_nonzero(x == hi)
+    return counts, numpy.linspace(lo, hi, nbins + 1)
+
+
+def _fast_hist2d(x, y, bins, range=None):
+    """
+    Compute a 2d histogram using fast_histogram.
+
+    Returns (counts, xedges, yedges) with the same semantics as numpy.histogram2d,
+    or None if fast_histogram is unavailable, the bins are not uniform or either
+    x or y is integer valued (see _fast_hist1d).
+    """
+    if fast_histogram is None or _is_integer_valued(x) or _is_integer_valued(y):
+        return None
+    try:
+        N = len(bins)
+    except TypeError:
+        N = 1
+    if N != 2:  # Same convention as numpy.histogram2d
+        bins = [bins, bins]
+    if range is None:
+        range = [None, None]
+    xspec = _uniform_bins(x, bins[0], range[0])
+    yspec = _uniform_bins(y, bins[1], range[1])
+    if xspec is None or yspec is None:
+        return None
+    (nx, (xlo, xhi)), (ny, (ylo, yhi)) = xspec, yspec
+    counts = fast_histogram.histogram2d(x, y, bins=[nx, ny], range=[(xlo, xhi), (ylo, yhi)])
+    # numpy includes the right edges in the last bins; fast_histogram doesn't.
+    on_xhi = x == xhi
+    on_yhi = y == yhi
+    if on_xhi.any() or on_yhi.any():
+        counts += numpy.histogram2d(x[on_xhi | on_yhi], y[on_xhi | on_yhi],
+                                    bins=[nx, ny], range=[(xlo, xhi), (ylo, yhi)])[0]
+    return counts, numpy.linspace(xlo, xhi, nx + 1), numpy.linspace(ylo, yhi, ny + 1)
+
+
+def _m4_indexes(x, y, num_columns):
+    """
+    Select the events needed to draw a scatter plot of (x, y) at the given resolution (M4 aggregation).
+
+    The x range is split into num_columns uniform columns (typically one per pixel), and
+    for each column only the events with the min y, the max y, and the first and last
+    events are kept.
+
+    Returns
+    -------
+    Sorted array of the positional indexes of the selected events.
+    """
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+    finite = numpy.flatnonzero(numpy.isfinite(x) & numpy.isfinite(y))
+    if not len(finite):
+        return finite
+    x = x[finite]
+    y = y[finite]
+    xmin, xmax = x.min(), x.max()
+    if xmax > xmin:
+        column = ((x - xmin) * (num_columns / (xmax - xmin))).astype(numpy.intp)
+        numpy.minimum(column, num_columns - 1, out=column)
+    else:
+        column = numpy.zeros(len(x), dtype=numpy.intp)
+    by_order = numpy.argsort(column, kind='mergesort')  # Stable: keeps event order per column
+    by_y = numpy.lexsort((y, column))
+    sorted_column = column[by_order]
+    starts = numpy.r_[0, numpy.flatnonzero(numpy.diff(sorted_column)) + 1]
+    ends = numpy.r_[starts[1:], len(sorted_column)] - 1
+    selected = numpy.concatenate((by_order[starts], by_order[ends], by_y[starts], by_y[ends]))
+    return finite[numpy.unique(selected)]
+
 
 @doc_replacer
 def plotFCM(data, channel_names, kind='histogram', ax=None,
@@ -62,7 +220,19 @@ def plotFCM(data, channel_names, kind='histogram', ax=None,
                               "This event won't be plotted unless the bin locations"
                               " are explicitly provided to the plotting function. ")
                 return None
-            plot_output = ax.hist(x, **kwargs)
+            hist = None
+            if 'weights' not in kwargs:
+                hist = _int_hist1d(x, kwargs['bins'], kwargs.get('range'))
+                if hist is None:
+                    hist = _fast_hist1d(x, kwargs['bins'], kwargs.get('range'))
+            if hist is not None:
+                # Let matplotlib draw the precomputed counts (one weighted point per bin)
+                counts, edges = hist
+                kwargs.pop('range', None)
+                kwargs['bins'] = edges
+                plot_output = ax.hist((edges[:-1] + edges[1:]) / 2, weights=counts, **kwargs)
+            else:
+                plot_output = ax.hist(x, **kwargs)
         else:
             return None
 
@@ -81,7 +251,21 @@ def plotFCM(data, channel_names, kind='histogram', ax=None,
             kwargs.setdefault('cmin', 1)
             kwargs.setdefault('cmap', pl.cm.copper)
             kwargs.setdefault('norm', matplotlib.colors.LogNorm())
-            plot_output = ax.hist2d(x, y, **kwargs)
+            hist = None
+            if 'weights' not in kwargs:
+                hist = _fast_hist2d(x, y, kwargs['bins'], kwargs.get('range'))
+            if hist is not None:
+                # Let matplotlib draw the precomputed counts (one weighted point per bin)
+                counts, xedges, yedges = hist
+                xcenters, ycenters = numpy.meshgrid((xedges[:-1] + xedges[1:]) / 2,
+                                                    (yedges[:-1] + yedges[1:]) / 2,
+                                                    indexing='ij')
+                kwargs.pop('range', None)
+                kwargs['bins'] = [xedges, yedges]
+                plot_output = ax.hist2d(xcenters.ravel(), ycenters.ravel(),
+                                        weights=counts.ravel(), **kwargs)
+            else:
+                plot_output = ax.hist2d(x, y, **kwargs)
             mappable = plot_output[-1]
 
             if colorbar:
@@ -16,11 +16,12 @@ TODO:
 """
 from __future__ import division
 
+import threading
 import warnings
 
+import numpy
 from numpy import (log, log10, exp, where, sign, vectorize, min, max, linspace, logspace, r_, abs,
                    asarray)
-from numpy.lib.shape_base import apply_along_axis
 from scipy.interpolate import InterpolatedUnivariateSpline
 from scipy.optimize import brentq
 
@@ -30,6 +31,46 @@ _machine_max = 2 ** 18
 _l_mmax = log10(_machine_max)
 _display_max = 10 ** 4
 
+##
+# Compiled kernels for the forward log transforms (see _kernels.py).
+# numba is only imported (and the kernels compiled) the first time they are needed;
+# if it is not installed the numpy/scipy implementations are used.
+_kernels = None
+
+# The kernels are themselves parallel; depending on the threading layer numba picked,
+# they may not be launched from several threads at once (e.g., when transforming a collection
+# with n_jobs != 1).
+_kernel_lock = threading.Lock()
+
+
+def _get_kernels():
+    """ Returns the module of compiled kernels, or None if numba is not installed. """
+    global _kernels
+    if _kernels is None:
+        try:
+            from FlowCytometryTools.core import _kernels as kernels
+        except ImportError:
+            kernels = False
+        _kernels = kernels
+    return _kernels or None
+
+
+def _apply_kernel(name, x, *args):
+    """
+    Apply the compiled elementwise kernel with the given name to x (float array of any shape).
+    Returns None if the kernel cannot be used, in which case the caller should fall back to numpy.
+    """
+    x = asarray(x)
+    if x.dtype.kind != 'f' or not x.size:
+        return None
+    kernels = _get_kernels()
+    if kernels is None:
+        return None
+    flat = numpy.ascontiguousarray(x, dtype=numpy.float64).ravel()
+    with _kernel_lock:
+        y = getattr(kernels, name)(flat, *[float(a) for a in args])
+    return y.reshape(x.shape)
+
 
 def linear(x, old_range, new_range):
     """
@@ -77,6 +118,9 @@ def tlog(x, th=1, r=_display_max, d=_l_mmax):
     """
     if th <= 0:
         raise ValueError('Threshold value must be positive. %s given.' % th)
+    y = _apply_kernel('tlog_fwd', x, th, r, d)
+    if y is not None:
+        return y
     return where(x <= th, log10(th) * 1. * r / d, log10(x) * 1. * r / d)
 
 
@@ -243,15 +287,15 @@ def hlog(x, b=500, r=_display_max, d=_l_mmax):
     -------
     Array of transformed values.
     """
-    hlog_fun = _make_hlog_numeric(b, r, d)
-    if not hasattr(x, '__len__'):  # if transforming a single number
+    if hasattr(x, '__len__') and not len(x):  # if transforming empty container
+        return x
+    y = _apply_kernel('hlog_fwd', x, b, r, d)
+    if y is None:
+        hlog_fun = _make_hlog_numeric(b, r, d)
         y = hlog_fun(x)
-    else:
-        n = len(x)
-        if not n:  # if transforming empty container
-            return x
-        else:
-            y = hlog_fun(x)
+    elif numpy.isnan(y).sum() > numpy.isnan(asarray(x)).sum():
+        # Same failure as the brentq based implementation
+        raise ValueError('f(a) and f(b) must have different signs')
     return y
 
 
@@ -376,12 +420,14 @@ class Transformation(BaseObject):
         -------
         Array of transformed values.
         """
-        x = asarray(x, dtype=float)
+        x = asarray(x, dtype=float, order='C')
 
         if use_spln:
             if self.spln is None:
                 self.set_spline(x.min(), x.max(), **kwargs)
-            return apply_along_axis(self.spln, 0, x)
+            # The spline is elementwise: evaluate it in one call over the contiguous buffer
+            # rather than column by column over strided views.
+            return self.spln(x.ravel()).reshape(x.shape)
         else:
             return self.tfun(x, *self.args, **self.kwargs)
 
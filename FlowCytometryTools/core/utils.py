@@ -2,16 +2,25 @@ import re
 import glob
 import os
 import fnmatch
+import multiprocessing
 
 try:
     import cPickle as pickle
 except ImportError:
     import pickle
 
-import collections
+try:
+    from collections.abc import Iterable
+except ImportError:  # Python 2
+    from collections import Iterable
 
 import six
 
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # Python 2 without the futures backport
+    ThreadPoolExecutor = None
+
 
 def get_tag_value(string, pre, post, tagtype=float, greedy=True):
     """
@@ -154,7 +163,7 @@ def to_iter(obj):
     else:
         # Nesting here since symmetry is broken in isinstance checks.
         # Strings are iterables in python 3, so the relative order of if statements is important.
-        if isinstance(obj, collections.Iterable):
+        if isinstance(obj, Iterable):
             return obj
         else:
             return [obj]
@@ -173,6 +182,31 @@ def to_list(obj):
         return list(obj)
 
 
+def thread_map(func, items, n_jobs=1):
+    """
+    Apply func to each of the items, returning a list of the results (in the order of the items).
+
+    Parameters
+    ----------
+    func : callable
+    items : iterable
+    n_jobs : int
+        Number of threads to use.
+        1 applies func serially, -1 uses as many threads as there are processors.
+        Threads only speed things up when func spends its time in code that releases the GIL
+        (like most numpy operations).
+        If concurrent.futures is not available, func is applied serially.
+    """
+    items = list(items)
+    if n_jobs < 0:
+        n_jobs = multiprocessing.cpu_count()
+    n_jobs = min(n_jobs, len(items))
+    if n_jobs <= 1 or ThreadPoolExecutor is None:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(func, items))
+
+
 class BaseObject(object):
     """
     Object providing common utility methods.
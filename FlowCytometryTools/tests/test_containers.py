@@ -0,0 +1,148 @@
+import os
+import unittest
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from FlowCytometryTools import FCMeasurement, FCPlate, ThresholdGate
+from FlowCytometryTools.core.transforms import Transformation
+
+base_path = os.path.dirname(os.path.realpath(__file__))
+
+test_path = os.path.join(base_path, 'data', 'FlowCytometers',
+                         'HTS_BD_LSR-II', 'HTS_BD_LSR_II_Mixed_Specimen_001_D6_D06.fcs')
+
+plate_path = os.path.join(base_path, 'data', 'Plate01')
+
+
+class TestFCMeasurement(unittest.TestCase):
+    def test_counts_of_unloaded_measurement(self):
+        """ The number of events is read from the TEXT segment when the data is not loaded. """
+        num_events = FCMeasurement(ID='loaded', datafile=test_path).data.shape[0]
+
+        sample = FCMeasurement(ID='unloaded', datafile=test_path)
+
+        def read_data(**kwargs):
+            raise AssertionError('the DATA segment should not be read')
+
+        sample.read_data = read_data
+        self.assertEqual(sample.counts, num_events)
+        self.assertIsNone(sample._data)
+
+    def test_counts_with_queued_actions(self):
+        """ Queued actions are applied before counting the events. """
+        sample = FCMeasurement(ID='test', datafile=test_path)
+        gate = ThresholdGate(1000.0, 'FSC-A', region='above')
+        expected = (sample.data['FSC-A'] > 1000.0).sum()
+        self.assertLess(expected, sample.counts)
+
+        queued = FCMeasurement(ID='test', datafile=test_path).gate(gate, apply_now=False)
+        self.assertEqual(len(queued.queue), 1)
+        self.assertEqual(queued.counts, expected)
+        self.assertEqual(sample.gate(gate).counts, expected)
+
+    def test_plot_gate_colors(self):
+        """ A single color is used for all gates, an iterable of colors is cycled over. """
+        from matplotlib.figure import Figure
+
+        sample = FCMeasurement(ID='test', datafile=test_path)
+        gates = [ThresholdGate(t, 'FSC-A', region='above') for t in (1000.0, 2000.0, 3000.0)]
+        test_cases = (
+            ('r', ['r', 'r', 'r']),
+            ((0.1, 0.2, 0.3), [(0.1, 0.2, 0.3)] * 3),
+            (['r'], ['r', 'r', 'r']),
+            (['r', 'g'], ['r', 'g', 'r']),
+        )
+        for gate_colors, expected in test_cases:
+            ax = Figure().add_subplot(111)
+            sample.plot('FSC-A', gates=gates, gate_colors=gate_colors, ax=ax)
+            self.assertEqual([l.get_color() for l in ax.lines], expected)
+
+
+class TestFCPlate(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.plate = FCPlate.from_dir(ID='plate', path=plate_path, pattern='RFP_*.fcs',
+                                     parser='name')
+        cls.plate.set_data()
+
+    def assertSameData(self, collection, expected):
+        self.assertEqual(sorted(collection.keys()), sorted(expected.keys()))
+        for key, measurement in expected.items():
+            self.assertEqual(list(collection[key].data.columns), list(measurement.data.columns))
+            assert_array_equal(collection[key].data.values, measurement.data.values)
+
+    def test_shared_spline_spans_collection(self):
+        """ A Transformation without a spline gets one spanning the data of the whole collection. """
+        channels = ['FSC-A', 'SSC-A']
+        transformer = Transformation('hlog', b=100, d=np.log10(2 ** 18))
+        self.assertIsNone(transformer.spln)
+        transformed, transformer = self.plate.transform(transformer, channels=channels,
+                                                        get_transformer=True)
+
+        values = np.concatenate([m.data[channels].values.ravel() for m in self.plate.values()])
+        knots = transformer.spln.get_knots()
+        np.testing.assert_allclose([knots[0], knots[-1]], [values.min(), values.max()],
+                                   rtol=1e-6)
+        # Each measurement's own range is narrower than that of the collection
+        self.assertTrue(any(m.data[channels].values.max() < values.max()
+                            for m in self.plate.values()))
+
+        for key, measurement in self.plate.items():
+            expected = transformer(measurement.data[channels].values, use_spln=True)
+            np.testing.assert_allclose(transformed[key].data[channels].values, expected,
+                                       rtol=1e-6)
+
+    def test_transform_empty_collection(self):
+        """ A shared transform needs at least one measurement to get the channels from. """
+        empty = FCPlate('empty', measurements={}, position_mapper='name')
+        with self.assertRaises(ValueError):
+            empty.transform('hlog')
+
+    def test_parallel_transform(self):
+        """ Transforming the measurements in parallel gives the same results as serially. """
+        test_cases = (
+            {'share_transform': True, 'use_spln': True},
+            {'share_transform': False, 'use_spln': True},
+            # Without the spline, the compiled kernels are used (if numba is available)
+            {'share_transform': True, 'use_spln': False},
+            {'share_transform': False, 'use_spln': False},
+        )
+        for transform in ('hlog', 'tlog'):
+            for kwargs in test_cases:
+                serial = self.plate.transform(transform, channels=['FSC-A', 'SSC-A'], **kwargs)
+                parallel = self.plate.transform(transform, channels=['FSC-A', 'SSC-A'],
+                                                n_jobs=-1, **kwargs)
+                self.assertSameData(parallel, serial)
+
+    def test_parallel_transform_with_unshared_transformation(self):
+        """ A Transformation without a spline gets the spline of the first measurement. """
+        channels = ['FSC-A', 'SSC-A']
+        results = []
+        for n_jobs in (1, -1):
+            transformer = Transformation('hlog', b=100, d=np.log10(2 ** 18))
+            results.append(self.plate.transform(transformer, share_transform=False,
+                                                channels=channels, n_jobs=n_jobs))
+            first = next(iter(self.plate.values()))
+            values = first.data[channels].values
+            knots = transformer.spln.get_knots()
+            np.testing.assert_allclose([knots[0], knots[-1]], [values.min(), values.max()],
+                                       rtol=1e-6)
+        self.assertSameData(results[1], results[0])
+
+    def test_parallel_gate_apply_and_counts(self):
+        """ Gating, applying and counting in parallel give the same results as serially. """
+        gate = ThresholdGate(10000.0, 'FSC-A', region='above')
+        serial = self.plate.gate(gate)
+        parallel = self.plate.gate(gate, n_jobs=-1)
+        self.assertSameData(parallel, serial)
+
+        counts = serial.counts(output_format='dict')
+        self.assertEqual(parallel.counts(output_format='dict', n_jobs=-1), counts)
+        self.assertTrue(any(c < 10000 for c in counts.values()))
+
+        def median(data):
+            return data['FSC-A'].median()
+
+        self.assertEqual(self.plate.apply(median, output_format='dict', n_jobs=-1),
+                         self.plate.apply(median, output_format='dict'))
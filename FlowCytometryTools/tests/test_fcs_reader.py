@@ -1,6 +1,8 @@
 from __future__ import print_function
 
 import os
+import shutil
+import tempfile
 import timeit
 import unittest
 import warnings
@@ -9,6 +11,8 @@ import numpy
 from fcsparser import parse as parse_fcs
 from numpy import array
 
+from FlowCytometryTools import FCMeasurement
+
 BASE_PATH = os.path.dirname(os.path.realpath(__file__))
 
 # Parent directory where the various fcs test files live.
@@ -255,6 +259,63 @@ class TestFCSReader(unittest.TestCase):
             self.assertTrue(meta['_channel_names_'])
             self.assertTrue(len(meta['_channel_names_']) != 0)
 
+    def test_lazy_reading(self):
+        """ Memory mapped data is identical to the data read by the parser. """
+        for fname in file_formats.values():
+            data = FCMeasurement(ID='read', datafile=fname).data
+            lazy = FCMeasurement(ID='lazy', datafile=fname, readdata_kwargs={'lazy': True})
+            self.assertEqual(list(lazy.data.columns), list(data.columns))
+            numpy.testing.assert_array_equal(lazy.data.values, data.values)
+        # Little endian files are memory mapped, big endian ones are read normally
+        little_endian = FCMeasurement(ID='lazy', datafile=file_formats['mq fcs 3.1'])
+        big_endian = FCMeasurement(ID='lazy', datafile=file_formats['LSR II fcs 3.0'])
+        self.assertIsNotNone(little_endian._memmap_data())
+        self.assertIsNone(big_endian._memmap_data())
+
+        # Little endian integer data whose values must be masked ($PnR=1024 < 2**$PnB)
+        # is read normally as well.
+        # The file is generated from the big endian FACSCalibur file.
+        fname = os.path.join(BASE_TEST_PATH, 'FACSCaliburHTS', 'Sample_Well_A02.fcs')
+        header = parse_fcs(fname, meta_data_only=True)['__header__']
+        with open(fname, 'rb') as f:
+            content = bytearray(f.read())
+        text_end = header['text end']
+        content[:text_end] = content[:text_end].replace(b'4,3,2,1', b'1,2,3,4')
+        start, end = header['data start'], header['data end'] + 1
+        words = numpy.frombuffer(bytes(content[start:end]), dtype='>u2')
+        words = words | 0xF000  # Set bits above $PnR, which the parser may mask
+        content[start:end] = words.astype('<u2').tobytes()
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'little_endian_integer.fcs')
+            with open(path, 'wb') as f:
+                f.write(content)
+            data = FCMeasurement(ID='read', datafile=path).data
+            lazy = FCMeasurement(ID='lazy', datafile=path, readdata_kwargs={'lazy': True})
+            self.assertIsNone(lazy._memmap_data())
+            self.assertEqual(list(lazy.data.dtypes), list(data.dtypes))
+            numpy.testing.assert_array_equal(lazy.data.values, data.values)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_data_dtype(self):
+        """ Floating point data is stored in single precision unless another dtype is given. """
+        fname = file_formats['mq fcs 3.1']
+        parsed = parse_fcs(fname, meta_data_only=False, reformat_meta=True)[1]
+
+        data = FCMeasurement(ID='default', datafile=fname).data
+        self.assertTrue(all(t == numpy.float32 for t in data.dtypes))
+
+        data = FCMeasurement(ID='double', datafile=fname,
+                             readdata_kwargs={'dtype': numpy.float64}).data
+        self.assertTrue(all(t == numpy.float64 for t in data.dtypes))
+        numpy.testing.assert_array_equal(data.values, parsed.values)
+
+        data = FCMeasurement(ID='as parsed', datafile=fname,
+                             readdata_kwargs={'dtype': None}).data
+        self.assertEqual(list(data.dtypes), list(parsed.dtypes))
+        numpy.testing.assert_array_equal(data.values, parsed.values)
+
     def test_channel_naming_manual(self):
         """ Checks that channel names correspond to manual setting """
         pnn_names = ['Time', 'HDR-CE', 'HDR-SE', 'HDR-V', 'FSC-A', 'FSC-H', 'FSC-W',
@@ -0,0 +1,107 @@
+import unittest
+
+import numpy as np
+from numpy.testing import assert_equal, assert_almost_equal
+
+from FlowCytometryTools.core import graph
+
+
+class TestIntegerHistogram(unittest.TestCase):
+    def test_int_hist1d_matches_numpy(self):
+        rng = np.random.RandomState(0)
+        test_data = (
+            rng.randint(0, 1024, size=10000).astype(np.uint16),
+            rng.randint(-30000, 30000, size=10000).astype(np.int16),
+            np.array([5, 5, 5], dtype=np.int32),
+        )
+        test_cases = (
+            # (bins, range)
+            (200, None),
+            (7, (10, 500)),
+            (np.array([-100, 0, 3, 100, 1000]), None),
+        )
+        for x in test_data:
+            for bins, hist_range in test_cases:
+                counts, edges = graph._int_hist1d(x, bins, hist_range)
+                expected_counts, expected_edges = np.histogram(x, bins, hist_range)
+                assert_equal(counts, expected_counts)
+                assert_almost_equal(edges, expected_edges)
+
+    def test_non_integer_data(self):
+        self.assertIsNone(graph._int_hist1d(np.array([1.0, 2.0]), 10))
+        self.assertIsNone(graph._int_hist1d(np.array([0, 2 ** 30]), 10))
+
+
+@unittest.skipIf(graph.fast_histogram is None, 'fast_histogram is not installed')
+class TestFastHistogram(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.x = rng.normal(size=10000).astype(np.float32)
+        self.y = rng.normal(size=10000).astype(np.float32)
+
+    def test_hist1d_matches_numpy(self):
+        test_cases = (
+            # (bins, range)
+            (50, None),
+            (50, (-1, 1)),
+            (np.linspace(-2, 2, 41), None),
+        )
+        for bins, hist_range in test_cases:
+            counts, edges = graph._fast_hist1d(self.x, bins, hist_range)
+            expected_counts, expected_edges = np.histogram(self.x, bins, hist_range)
+            assert_equal(counts, expected_counts)
+            assert_almost_equal(edges, expected_edges)
+
+    def test_hist2d_matches_numpy(self):
+        test_cases = (
+            (50, None),
+            ([20, 30], [(-1, 1), (-2, 2)]),
+            ([np.linspace(-2, 2, 41), np.linspace(-1, 1, 21)], None),
+        )
+        for bins, hist_range in test_cases:
+            counts, xedges, yedges = graph._fast_hist2d(self.x, self.y, bins, hist_range)
+            expected = np.histogram2d(self.x, self.y, bins, hist_range)
+            assert_equal(counts, expected[0])
+            assert_almost_equal(xedges, expected[1])
+            assert_almost_equal(yedges, expected[2])
+
+    def test_values_on_bin_edges(self):
+        # Integer valued data often lies exactly on the bin edges.
+        # fast_histogram may bin these events differently than numpy, so it isn't used.
+        rng = np.random.RandomState(1)
+        for _ in range(200):
+            x = rng.randint(-50, 1000, size=2000).astype(np.float32)
+            nbins = rng.randint(5, 300)
+            self.assertIsNone(graph._fast_hist1d(x, nbins))
+            self.assertIsNone(graph._fast_hist2d(x, self.x[:2000], nbins))
+            self.assertIsNone(graph._fast_hist2d(self.x[:2000], x, nbins))
+        with_nan = np.array([0, 1, 2, np.nan, 10], dtype=np.float32)
+        self.assertIsNone(graph._fast_hist1d(with_nan, 5))
+
+        # Events on the outer edges are counted like numpy does
+        x = np.r_[self.x, -1, -1, 1, 1].astype(np.float32)
+        counts, _ = graph._fast_hist1d(x, 20, (-1, 1))
+        assert_equal(counts, np.histogram(x, 20, (-1, 1))[0])
+
+    def test_non_uniform_bins(self):
+        bins = np.array([0, 1, 3, 10])
+        self.assertIsNone(graph._fast_hist1d(self.x, bins))
+        self.assertIsNone(graph._fast_hist2d(self.x, self.y, [bins, bins]))
+
+
+class TestM4Downsampling(unittest.TestCase):
+    def test_m4_indexes(self):
+        x = np.array([0.0, 0.1, 0.2, 0.3, 0.6, 0.7, 0.8, 0.9, 1.0, np.nan])
+        y = np.array([5.0, 1.0, 9.0, 3.0, 2.0, 0.0, 4.0, 6.0, 8.0, 1.0])
+
+        # Two columns: [0, 0.5) and [0.5, 1.0]
+        # Column 1: first=0, min y=1, max y=2, last=3
+        # Column 2: first=4, min y=5, max y=8, last=8
+        assert_equal(graph._m4_indexes(x, y, 2), [0, 1, 2, 3, 4, 5, 8])
+
+        # With as many columns as events every event is kept (except for the nan)
+        assert_equal(graph._m4_indexes(x, y, 100), np.arange(9))
+
+        # Events with a nan y are dropped too (nan would otherwise be taken as the max y)
+        y[2] = np.nan
+        assert_equal(graph._m4_indexes(x, y, 2), [0, 1, 3, 4, 5, 8])
@@ -1,4 +1,6 @@
 """Shallow tests that at least attempt to import some code."""
+import subprocess
+import sys
 import unittest
 
 
@@ -7,3 +9,17 @@ class TestImports(unittest.TestCase):
         from FlowCytometryTools.gui import dialogs, fc_widget  # noqa
         from FlowCytometryTools.core import (graph, gates, bases, containers, docstring,
                                              transforms)  # noqa
+
+    def test_import_does_not_load_matplotlib(self):
+        """ matplotlib is only imported when plotting. """
+        # Run in a new interpreter, since the other tests import matplotlib.
+        code = ('import sys\n'
+                'import fcsparser, numpy, pandas, scipy\n'
+                'print("matplotlib" in sys.modules)\n'
+                'import FlowCytometryTools\n'
+                'print("matplotlib" in sys.modules)\n')
+        output = subprocess.check_output([sys.executable, '-c', code])
+        loaded_by_dependencies, loaded = output.decode().split()
+        if loaded_by_dependencies == 'True':
+            self.skipTest('matplotlib is imported by the dependencies (e.g., older pandas)')
+        self.assertEqual(loaded, 'False')
@@ -116,6 +116,13 @@ class TestTransforms(unittest.TestCase):
         d = (result1 - result2) / result1
         assert_almost_equal(d, np.zeros(len(d)), decimal=2)
 
+    def test_hlog_matches_numeric_solver(self):
+        # The compiled kernel (when numba is installed) should agree with the brentq solver
+        for b in (500, 10):
+            expected = trans._make_hlog_numeric(b, _ymax, np.log10(_xmax))(_xall)
+            result = trans.hlog(_xall, b=b)
+            assert_almost_equal(result, expected, decimal=8)
+
     def test_hlog_inv(self):
         expected = _xall
         result = trans.hlog_inv(trans.hlog(_xall))
@@ -159,3 +166,25 @@ class TestTransforms(unittest.TestCase):
         for transformation, channels, kwargs in test_cases:
             self.fc_measurement.transform(transformation, channels=channels, **kwargs)
             self.fc_plate.transform(transformation, channels=channels, **kwargs)
+
+    def test_transform_return_only_transformed_channels(self):
+        """With return_all=False, the transformed channels are returned in the given order."""
+        channels = ['SSC-A', 'FSC-A']
+        transformer = Transformation('tlog', d=np.log10(_xmax))
+        transformed = self.fc_measurement.transform(transformer, channels=channels,
+                                                    return_all=False)
+        self.assertEqual(list(transformed.data.columns), channels)
+        expected = transformer(self.fc_measurement.data[channels].values, use_spln=True)
+        assert_equal(transformed.data.values, expected)
+
+        with self.assertRaises(KeyError):
+            self.fc_measurement.transform('tlog', channels=['FSC-A', 'not a channel'],
+                                          return_all=False)
+
+    def test_transformation_keeps_shape(self):
+        """Scalars and arrays of any shape keep their shape."""
+        transformation = Transformation('tlog')
+        self.assertEqual(np.shape(transformation(10.0, use_spln=False)), ())
+        x = np.array([[1.0, 10.0], [100.0, 1000.0]])
+        for use_spln in (False, True):
+            self.assertEqual(transformation(x, use_spln=use_spln).shape, x.shape)